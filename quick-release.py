@@ -8,6 +8,13 @@ import json
 import shutil
 import tempfile
 import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
 
 # ============================================================================
 # Configuration & Constants
@@ -25,12 +32,44 @@ COLORS = {
     "DIM": "\033[2m"
 }
 
+# Fallback commit type heuristics, checked in order (first match wins)
+TYPE_PATTERNS = [
+    ("test", re.compile(r"\.(test|spec)\.(ts|js|py)$", re.IGNORECASE)),
+    ("docs", re.compile(r"\.(md|txt|rst)$", re.IGNORECASE)),
+    ("build", re.compile(r"(package\.json|package-lock\.json|requirements\.txt)$", re.IGNORECASE)),
+    ("style", re.compile(r"\.(css|scss|less)$", re.IGNORECASE)),
+    ("feat", re.compile(r"\.(ts|js|py|java|cs|cpp|c|go|rs)$", re.IGNORECASE)),
+]
+
+# Max chars of copilot-instructions.md included in the Copilot prompt
+MAX_INSTRUCTIONS_SIZE = 2000
+
+TRAILING_SPACE_RE = re.compile(r"[ \t]+\n")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+BLANK_CHANGE_RE = re.compile(r"^[+-]\s*$")
+
+# Markdown fences in Copilot output: opening fence lines, a closing fence, any leftovers
+FENCE_RE = re.compile(r"^```[^\n]*\n|\n```$|```", re.MULTILINE)
+
+# Subject of a semantic-release commit
+RELEASE_MSG_RE = re.compile(r"^(chore\(release\)|Release)")
+
 def print_color(message, color="RESET", end="\n"):
     """Print message in color."""
     print(f"{COLORS.get(color, COLORS['RESET'])}{message}{COLORS['RESET']}", end=end)
 
-def run_command(command, shell=True, capture_output=True, text=True, check=False):
-    """Run a shell command and return the result."""
+def resolve_argv(command):
+    """Resolve the executable of an argv list via PATH (finds .cmd shims like npm on Windows)."""
+    if os.path.isabs(command[0]):
+        # Already resolved (e.g. the cached Copilot CLI path)
+        return list(command)
+    executable = shutil.which(command[0])
+    return [executable or command[0]] + list(command[1:])
+
+def run_command(command, shell=False, capture_output=True, text=True, check=False, input=None):
+    """Run a command (argv list, or a string when shell=True) and return the result."""
+    if not shell:
+        command = resolve_argv(command)
     try:
         result = subprocess.run(
             command,
@@ -38,30 +77,100 @@ def run_command(command, shell=True, capture_output=True, text=True, check=False
             capture_output=capture_output,
             text=text,
             check=check,
+            input=input,
             encoding='utf-8', 
             errors='replace'
         )
         return result
     except subprocess.CalledProcessError as e:
         return e
+    except FileNotFoundError as e:
+        return subprocess.CompletedProcess(command, 127, "", str(e))
+
+_repo = None
+
+def get_repo():
+    """Return a shared pygit2 Repository, or None if pygit2 is not installed."""
+    global _repo
+    if _repo is None and pygit2 is not None:
+        try:
+            _repo = pygit2.Repository(".")
+        except Exception:
+            _repo = None
+    return _repo
 
 def check_git_repo():
-    """Ensure we are in a git repository."""
-    if not os.path.exists(".git"):
+    """Ensure we are at the root of a git repository (worktrees and submodules included)."""
+    # --show-cdup fails outside a repo and prints the path to the root from a subdirectory
+    res = run_command(["git", "rev-parse", "--show-cdup"])
+    if res.returncode != 0 or res.stdout.strip():
         print_color("Error: Not a Git repository. Run this script from the repository root.", "RED")
         sys.exit(1)
 
 def get_current_branch():
     """Get the current active git branch."""
-    res = run_command("git rev-parse --abbrev-ref HEAD")
+    repo = get_repo()
+    if repo is not None:
+        try:
+            return repo.head.shorthand
+        except Exception:
+            return "unknown"
+
+    res = run_command(["git", "rev-parse", "--abbrev-ref", "HEAD"])
     if res.returncode == 0:
         return res.stdout.strip()
     return "unknown"
 
+def get_commit_hash(ref="HEAD"):
+    """Resolve a ref to its commit hash ("" if it cannot be resolved)."""
+    repo = get_repo()
+    if repo is not None:
+        try:
+            return str(repo.revparse_single(ref).peel(pygit2.Commit).id)
+        except Exception:
+            return ""
+
+    res = run_command(["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"])
+    return res.stdout.strip() if res.returncode == 0 else ""
+
+def get_commit_info(ref):
+    """Return (author name, subject) of the commit at ref."""
+    repo = get_repo()
+    if repo is not None:
+        try:
+            commit = repo.revparse_single(ref).peel(pygit2.Commit)
+            return commit.author.name, commit.message.split("\n", 1)[0].strip()
+        except Exception:
+            return "", ""
+
+    author = run_command(["git", "log", "-1", "--format=%an", ref]).stdout.strip()
+    msg = run_command(["git", "log", "-1", "--format=%s", ref]).stdout.strip()
+    return author, msg
+
+def get_remote_branch_hash(branch):
+    """Get the tip of origin/<branch> via ls-remote, without fetching objects."""
+    res = run_command(["git", "ls-remote", "--heads", "origin", branch])
+    if res.returncode != 0:
+        return ""
+    for line in res.stdout.splitlines():
+        parts = line.split("\t")
+        if len(parts) == 2 and parts[1].strip() == f"refs/heads/{branch}":
+            return parts[0].strip()
+    return ""
+
+_copilot_argv = None
+
+def get_copilot_argv():
+    """Resolve the Copilot CLI executable once and reuse it for every call."""
+    global _copilot_argv
+    if _copilot_argv is None:
+        _copilot_argv = resolve_argv(["copilot"])
+    return _copilot_argv
+
 def check_copilot_cli():
     """Check if GitHub Copilot CLI is installed."""
     # Try 'copilot --version'
-    res = run_command("copilot --version")
+    res = run_command(get_copilot_argv() + ["--version"])
     if res.returncode == 0:
         print_color(f"GitHub Copilot CLI detected: {res.stdout.strip()}", "DIM")
         return True
@@ -71,33 +180,15 @@ def check_copilot_cli():
     print_color("Then authenticate with: copilot auth", "YELLOW")
     return False
 
-def invoke_safe_pull(has_changes):
-    """Stash changes (if any), pull --rebase, then pop stash."""
+def invoke_safe_pull():
+    """Pull --rebase, letting git autostash local changes."""
     print_color("\nPulling latest changes...", "YELLOW")
     
-    stash_created = False
-    if has_changes:
-        print_color("Stashing local changes...", "DIM")
-        res = run_command(f'git stash push -u -m "Auto-release stash {time.strftime("%Y-%m-%d %H:%M:%S")}"')
-        if res.returncode == 0:
-            stash_created = True
-        else:
-            print_color("Error: Failed to stash changes", "RED")
-            sys.exit(1)
-            
-    # Pull with rebase
-    res = run_command("git pull --rebase")
-    pull_success = (res.returncode == 0)
-    
-    if stash_created:
-        print_color("Restoring local changes...", "DIM")
-        pop_res = run_command("git stash pop")
-        if pop_res.returncode != 0:
-            print_color("Error: Failed to restore stashed changes. Run 'git stash pop' manually.", "RED")
-            sys.exit(1)
-            
-    if not pull_success:
+    res = run_command(["git", "pull", "--rebase", "--autostash"])
+    if res.returncode != 0:
         print_color("Error: Pull failed! Please resolve conflicts manually.", "RED")
+        print_color("Finish with 'git rebase --continue' or undo with 'git rebase --abort';", "DIM")
+        print_color("either one re-applies your autostashed local changes.", "DIM")
         sys.exit(1)
         
     print_color("[OK] Repository updated", "GREEN")
@@ -110,13 +201,12 @@ def invoke_code_format(skip_format):
 
     print_color("\nFormatting code...", "YELLOW")
     
-    if not os.path.exists("package.json"):
-        print_color("No package.json found, skipping format", "CYAN")
-        return
-
     try:
         with open("package.json", "r") as f:
             package_json = json.load(f)
+    except FileNotFoundError:
+        print_color("No package.json found, skipping format", "CYAN")
+        return
     except Exception:
         print_color("Failed to parse package.json, skipping format", "CYAN")
         return
@@ -125,7 +215,7 @@ def invoke_code_format(skip_format):
         print_color("No 'format' script in package.json, skipping", "CYAN")
         return
 
-    res = run_command("npm run format")
+    res = run_command(["npm", "run", "format"])
     if res.returncode != 0:
         print_color("Format failed!", "RED")
         response = input("Continue anyway? (y/N) ")
@@ -134,13 +224,52 @@ def invoke_code_format(skip_format):
     else:
         print_color("[OK] Code formatted", "GREEN")
 
+def get_staged_stats():
+    """Return {path: (added, deleted)} for all staged files from a single numstat call."""
+    repo = get_repo()
+    if repo is not None and not repo.head_is_unborn:
+        # The index was just changed by 'git add', reload it from disk
+        repo.index.read()
+        diff = repo.diff("HEAD", cached=True)
+        diff.find_similar()
+        stats = {}
+        for patch in diff:
+            if patch.delta.is_binary:
+                counts = ("-", "-")
+            else:
+                _, adds, dels = patch.line_stats
+                counts = (str(adds), str(dels))
+            stats[patch.delta.new_file.path] = counts
+        return stats
+
+    res = run_command(["git", "diff", "--cached", "--numstat", "-z"])
+    stats = {}
+    # -z output: "<added>\t<deleted>\t<path>\0", or for renames
+    # "<added>\t<deleted>\t\0<old>\0<new>\0"
+    fields = res.stdout.split('\0')
+    i = 0
+    while i < len(fields):
+        parts = fields[i].split('\t', 2)
+        i += 1
+        if len(parts) < 3:
+            continue
+        path = parts[2]
+        if not path:
+            # Rename/copy: skip the old path, keep the new one
+            i += 1
+            path = fields[i] if i < len(fields) else ""
+            i += 1
+        if path:
+            stats[path] = (parts[0], parts[1])
+    return stats
+
 def get_staged_files():
-    """Stage all files and return the list."""
+    """Stage all files and return (files, stats)."""
     print_color("\nStaging changes...", "YELLOW")
-    run_command("git add .")
+    run_command(["git", "add", "."])
     
-    res = run_command("git diff --cached --name-only")
-    files = [f for f in res.stdout.split('\n') if f.strip()]
+    stats = get_staged_stats()
+    files = list(stats)
     
     if not files:
         print_color("No changes to commit.", "CYAN")
@@ -150,32 +279,18 @@ def get_staged_files():
     for f in files:
         print_color(f"  {f}", "RESET")
         
-    return files
+    return files, stats
 
-def get_fallback_commit_message(files, diff):
-    """Generate a basic commit message when Copilot is unavailable."""
+def get_fallback_commit_message(files):
+    """Generate a basic commit message when Copilot is unavailable (from file names only)."""
     print_color("Using smart fallback generation...", "YELLOW")
     
-    types = {
-        "test": [r"\.(test|spec)\.(ts|js|py)$"],
-        "docs": [r"\.(md|txt|rst)$"],
-        "build": [r"package\.json", r"package-lock\.json", r"requirements\.txt"],
-        "style": [r"\.(css|scss|less)$"],
-        "feat": [r"\.(ts|js|py|java|cs|cpp|c|go|rs)$"]
-    }
-    
     commit_type = "chore"
     
     # Simple heuristic
-    for t, patterns in types.items():
-        for f in files:
-            for p in patterns:
-                if re.search(p, f, re.IGNORECASE):
-                    commit_type = t
-                    break
-            if commit_type != "chore":
-                break
-        if commit_type != "chore":
+    for t, pattern in TYPE_PATTERNS:
+        if any(pattern.search(f) for f in files):
+            commit_type = t
             break
             
     summary = f"update {len(files)} files"
@@ -186,39 +301,135 @@ def get_fallback_commit_message(files, diff):
     msg += "\n\nAuto-generated commit message (Copilot CLI unavailable)"
     return msg
 
-def get_copilot_commit_message(diff, files, max_diff_size=5000):
+def compress_prompt(text):
+    """Strip trailing whitespace and collapse runs of blank lines."""
+    text = TRAILING_SPACE_RE.sub("\n", text)
+    return BLANK_LINES_RE.sub("\n\n", text)
+
+def compress_diff(diff):
+    """Drop diff hunks whose added/removed lines are all blank (and files left with no hunks)."""
+    out = []
+    header = []
+    hunks = []
+    hunk = []
+    file_hunks = 0
+
+    def flush_hunk():
+        changes = [l for l in hunk[1:] if l[:1] in ("+", "-")]
+        if not changes or not all(BLANK_CHANGE_RE.match(l) for l in changes):
+            hunks.extend(hunk)
+        hunk.clear()
+
+    def flush_file():
+        flush_hunk()
+        # Keep headers of hunk-less changes (binary, mode, rename), not of whitespace-only ones
+        if hunks or not file_hunks:
+            out.extend(header)
+            out.extend(hunks)
+        header.clear()
+        hunks.clear()
+
+    for line in diff.splitlines(keepends=True):
+        if line.startswith("@@"):
+            flush_hunk()
+            hunk.append(line)
+            file_hunks += 1
+        elif line.startswith("diff --git"):
+            flush_file()
+            file_hunks = 0
+            header.append(line)
+        elif hunk:
+            hunk.append(line)
+        else:
+            header.append(line)
+    flush_file()
+    return "".join(out)
+
+def truncate_diff(diff, budget):
+    """Keep whole hunks, with their file headers, from the start of the diff while they fit in budget chars.
+
+    If the first hunk alone is over budget, its header is kept and the hunk is cut at a line boundary:
+
+    >>> truncate_diff("diff --git a/x b/x\\n@@ -1 +1,3 @@\\n+one\\n+two\\n+six\\n", 40)
+    'diff --git a/x b/x\\n@@ -1 +1,3 @@\\n+one\\n'
+    """
+    out = []
+    size = 0
+    header = []  # header of the current file, emitted along with its first kept hunk
+    hunk = []
+    kept_hunk = False
+
+    def emit(lines):
+        nonlocal size
+        out.extend(lines)
+        size += sum(len(l) for l in lines)
+
+    def fits(lines):
+        return size + sum(len(l) for l in lines) <= budget
+
+    for line in diff.splitlines(keepends=True) + [None]:
+        if line is not None and not line.startswith(("@@", "diff --git")):
+            (hunk if hunk else header).append(line)
+            continue
+
+        if hunk:
+            if not fits(header + hunk):
+                if not kept_hunk:
+                    # Not even the first hunk fits: keep its file header, cut the hunk at a line boundary
+                    for l in header + hunk:
+                        if not fits([l]):
+                            break
+                        emit([l])
+                return "".join(out)
+            emit(header + hunk)
+            header = []
+            hunk = []
+            kept_hunk = True
+
+        if line is None or line.startswith("diff --git"):
+            # A pending header here belongs to a file without hunks (binary, mode change, rename)
+            if header:
+                if not fits(header):
+                    return "".join(out)
+                emit(header)
+            header = [line] if line is not None else []
+        else:
+            hunk = [line]
+
+    return "".join(out)
+
+def get_copilot_commit_message(diff, files, stats=None, max_diff_size=5000, nonce=None):
     """Generate commit message using GitHub Copilot CLI."""
     print_color("\nGenerating commit message with GitHub Copilot CLI...", "YELLOW")
     
+    # Whitespace-only hunks carry no meaning for the message
+    diff = compress_diff(diff)
+
     # Truncate diff if too large
     original_len = len(diff)
     if original_len > max_diff_size:
-        diff = diff[:max_diff_size]
-        last_hunk = diff.rfind("\n@@")
-        if last_hunk > max_diff_size * 0.8:
-            diff = diff[:last_hunk]
+        diff = truncate_diff(diff, max_diff_size)
         print_color(f"Diff truncated from {original_len} to {len(diff)} chars", "DIM")
 
     # Read instructions
     instructions = ""
-    if os.path.exists("copilot-instructions.md"):
-        try:
-            with open("copilot-instructions.md", "r", encoding='utf-8') as f:
-                instructions = f.read()
-            print_color("Using copilot-instructions.md for context", "DIM")
-        except:
-            pass
+    try:
+        with open("copilot-instructions.md", "r", encoding='utf-8') as f:
+            instructions = compress_prompt(f.read()).strip()
+        if len(instructions) > MAX_INSTRUCTIONS_SIZE:
+            instructions = instructions[:MAX_INSTRUCTIONS_SIZE] + "\n[truncated]"
+        print_color("Using copilot-instructions.md for context", "DIM")
+    except Exception:
+        pass
             
     # File summary stats
+    if stats is None:
+        stats = get_staged_stats()
     file_summary = []
     for f in files:
-        res = run_command(f"git diff --cached --numstat -- \"{f}\"")
-        if res.stdout.strip():
-            parts = res.stdout.strip().split("\t")
-            if len(parts) >= 2:
-                file_summary.append(f"- {f} (+{parts[0]}/-{parts[1]})")
-            else:
-                file_summary.append(f"- {f}")
+        if f in stats:
+            adds, dels = stats[f]
+            file_summary.append(f"- {f} (+{adds}/-{dels})")
         else:
             file_summary.append(f"- {f}")
     
@@ -250,74 +461,73 @@ IMPORTANT:
 - First line is header, blank line, then body
 - If breaking changes, include 'BREAKING CHANGE:' section
 """
+    if nonce:
+        prompt += f"- This is a regeneration (variant {nonce}): write a different candidate than before\n"
     
     try:
         print_color("Calling GitHub Copilot CLI...", "CYAN")
         
-        # Write prompt to temp file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as f:
-            f.write(prompt)
-            prompt_file = f.name
-            
-        try:
-            # Run copilot
-            # In PowerShell: Get-Content prompt | copilot --allow-all-tools
-            # In Python subprocess, we can pipe input
-            print_color("Executing copilot...", "DIM")
-            
-            with open(prompt_file, 'r', encoding='utf-8') as pf:
-                res = subprocess.run(
-                    ["copilot", "--allow-all-tools"],
-                    stdin=pf,
-                    capture_output=True,
-                    text=True,
-                    shell=True
-                )
-            
-            if res.returncode != 0:
-                raise Exception(f"Copilot failed with code {res.returncode}: {res.stderr}")
-                
-            raw_output = res.stdout
-            
-            # Basic cleanup of markdown block
-            cleaned = re.sub(r'^```.*?\n', '', raw_output, flags=re.MULTILINE)
-            cleaned = re.sub(r'\n```$', '', cleaned)
-            cleaned = cleaned.replace('```', '').strip()
-            
-            # Copilot CLI normally outputs stats at the end or as separate messages
-            # We'll just take the cleaned output.
+        # Run copilot, piping the prompt straight to stdin
+        # (equivalent of: Get-Content prompt | copilot --allow-all-tools)
+        print_color("Executing copilot...", "DIM")
+        
+        res = run_command(get_copilot_argv() + ["--allow-all-tools"], input=prompt)
+        
+        if res.returncode != 0:
+            raise Exception(f"Copilot failed with code {res.returncode}: {res.stderr}")
             
-            if not cleaned or len(cleaned) < 10:
-                raise Exception(f"Invalid output: {cleaned}")
-                
-            print_color(f"\n[OK] Commit message generated ({len(cleaned)} chars)", "GREEN")
-            return cleaned
+        raw_output = res.stdout
+        
+        # Basic cleanup of markdown block
+        cleaned = FENCE_RE.sub('', raw_output).strip()
+        
+        # Copilot CLI normally outputs stats at the end or as separate messages
+        # We'll just take the cleaned output.
+        
+        if not cleaned or len(cleaned) < 10:
+            raise Exception(f"Invalid output: {cleaned}")
             
-        finally:
-            if os.path.exists(prompt_file):
-                os.remove(prompt_file)
+        print_color(f"\n[OK] Commit message generated ({len(cleaned)} chars)", "GREEN")
+        return cleaned
                 
     except Exception as e:
         print_color(f"\nGitHub Copilot generation failed: {e}", "RED")
-        return get_fallback_commit_message(files, diff)
+        return get_fallback_commit_message(files)
 
-def invoke_commit(message):
-    """Commit changes."""
-    # Write message to temp file to handle quotes/newlines safely
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as f:
-        f.write(message)
+def edit_in_editor(initial):
+    """Open the message in the user's git editor and return the edited text (None if the editor failed)."""
+    # 'git var GIT_EDITOR' honours GIT_EDITOR, core.editor, VISUAL and EDITOR
+    editor = run_command(["git", "var", "GIT_EDITOR"]).stdout.strip()
+    if not editor:
+        editor = os.environ.get("EDITOR") or ("notepad" if os.name == "nt" else "vi")
+
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.COMMIT_EDITMSG', delete=False, encoding='utf-8') as f:
+        f.write(initial)
         msg_file = f.name
-        
+
     try:
-        res = run_command(f"git commit -F \"{msg_file}\"")
+        # Editor values are shell snippets (e.g. "code --wait"), like git runs them
+        res = subprocess.run(f'{editor} "{msg_file}"', shell=True)
         if res.returncode != 0:
-            print_color("Commit failed!", "RED")
-            print(res.stderr)
-            sys.exit(1)
-        print_color("[OK] Changes committed", "GREEN")
+            print_color(f"Editor '{editor}' exited with code {res.returncode}", "RED")
+            return None
+        with open(msg_file, 'r', encoding='utf-8') as f:
+            return f.read().strip()
     finally:
-        if os.path.exists(msg_file):
+        try:
             os.remove(msg_file)
+        except FileNotFoundError:
+            pass
+
+def invoke_commit(message):
+    """Commit changes."""
+    # Feed the message on stdin to handle quotes/newlines safely
+    res = run_command(["git", "commit", "-F", "-"], input=message)
+    if res.returncode != 0:
+        print_color("Commit failed!", "RED")
+        print(res.stderr)
+        sys.exit(1)
+    print_color("[OK] Changes committed", "GREEN")
 
 def invoke_push(branch, dry_run=False):
     """Push changes."""
@@ -326,7 +536,7 @@ def invoke_push(branch, dry_run=False):
         return
 
     print_color(f"\nPushing to origin/{branch}...", "YELLOW")
-    res = run_command("git push")
+    res = run_command(["git", "push"])
     if res.returncode != 0:
         print_color("Push failed! Commit saved locally.", "RED")
         sys.exit(1)
@@ -346,35 +556,40 @@ def wait_for_release(branch, max_wait_time, dry_run=False):
     print_color("Checking for automated release commit...", "DIM")
     
     start_time = time.time()
-    last_commit_hash = run_command("git rev-parse HEAD").stdout.strip()
+    last_commit_hash = get_commit_hash("HEAD")
     
+    # Back off 5s -> 10s -> 20s -> 30s (cap) between polls
     poll_interval = 5
+    max_poll_interval = 30
     
     while (time.time() - start_time) < max_wait_time:
-        time.sleep(poll_interval)
+        remaining = max_wait_time - (time.time() - start_time)
+        time.sleep(min(poll_interval, remaining))
+        poll_interval = min(poll_interval * 2, max_poll_interval)
         
-        # Fetch tags specifically to ensure latest version is visible
-        run_command("git fetch --tags origin")
-        run_command(f"git fetch origin {branch}")
-        
-        remote_commit = run_command(f"git rev-parse origin/{branch}").stdout.strip()
+        # Cheap tip check first; only fetch objects when the remote moved
+        remote_commit = get_remote_branch_hash(branch)
+        if remote_commit != last_commit_hash:
+            # Fetch tags along with the branch so the new version is visible
+            run_command(["git", "fetch", "origin", branch, "--tags"])
+            if not remote_commit:
+                remote_commit = get_commit_hash(f"origin/{branch}")
         
         if remote_commit != last_commit_hash:
             # Check author/message
-            author = run_command(f"git log -1 --format=\"%an\" origin/{branch}").stdout.strip()
-            msg = run_command(f"git log -1 --format=\"%s\" origin/{branch}").stdout.strip()
+            author, msg = get_commit_info(f"origin/{branch}")
             
-            if "semantic-release-bot" in author or re.match(r"^(chore\(release\)|Release)", msg):
+            if "semantic-release-bot" in author or RELEASE_MSG_RE.match(msg):
                 print_color("\n[OK] Semantic release detected!", "GREEN")
                 print_color(f"  Author: {author}", "DIM")
                 
                 print_color("\nPulling release commit...", "YELLOW")
-                res = run_command(f"git pull --rebase origin {branch}")
+                res = run_command(["git", "pull", "--rebase", "origin", branch])
                 
                 if res.returncode == 0:
                     # Get the absolute newest tag by date
                     # Fixed for Windows compatibility: use direct git command and parse in Python
-                    tag_list_res = run_command("git tag --sort=-v:refname")
+                    tag_list_res = run_command(["git", "tag", "--sort=-v:refname"])
                     tags = [t.strip() for t in tag_list_res.stdout.split('\n') if t.strip()]
                     tag = tags[0] if tags else "unknown"
                     print_color(f"[OK] Release commit pulled. New version: {tag}", "GREEN")
@@ -410,18 +625,19 @@ def main():
     current_branch = get_current_branch()
     print_color(f"Current branch: {current_branch}", "CYAN")
     
-    use_copilot = False
-    if not args.custom_message:
-        use_copilot = check_copilot_cli()
+    # The Copilot CLI check is an independent subprocess wait, overlap it with the pull.
+    # Formatting stays after the pull: it rewrites files that the rebase may touch.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        copilot_future = None
+        if not args.custom_message:
+            copilot_future = executor.submit(check_copilot_cli)
         
-    # Check status
-    res = run_command("git status --porcelain")
-    has_changes = bool(res.stdout.strip())
+        # Operations
+        invoke_safe_pull()
+        use_copilot = copilot_future.result() if copilot_future else False
     
-    # Operations
-    invoke_safe_pull(has_changes)
     invoke_code_format(args.skip_format)
-    staged_files = get_staged_files()
+    staged_files, staged_stats = get_staged_files()
     
     commit_message = ""
     
@@ -430,15 +646,14 @@ def main():
         print_color("\nUsing custom commit message:", "YELLOW")
         print(f"--------------------------------------------------\n{commit_message}\n--------------------------------------------------")
     else:
-        # Generate
-        print_color(f"\nPreparing diff for analysis...", "DIM")
-        res = run_command("git diff --cached") # diff of staged files
-        diff = res.stdout
-        
+        # Generate (the fallback only looks at file names, so only build the diff for Copilot)
+        diff = ""
         if use_copilot:
-            commit_message = get_copilot_commit_message(diff, staged_files, args.max_diff_size)
+            print_color(f"\nPreparing diff for analysis...", "DIM")
+            diff = run_command(["git", "diff", "--cached"]).stdout # diff of staged files
+            commit_message = get_copilot_commit_message(diff, staged_files, staged_stats, args.max_diff_size)
         else:
-            commit_message = get_fallback_commit_message(staged_files, diff)
+            commit_message = get_fallback_commit_message(staged_files)
             
         print_color("\n╔════════════════════════════════════════════════════════════════════╗", "GREEN")
         print_color("║                    Generated Commit Message                        ║", "GREEN")
@@ -447,7 +662,7 @@ def main():
         print_color("──────────────────────────────────────────────────────────────────────", "DIM")
         
         # User Confirmation
-        if not args.dry_run:
+        while not args.dry_run:
             print_color("\nOptions:", "CYAN")
             print("  [Enter]  Use this message")
             print("  e        Edit message")
@@ -457,25 +672,25 @@ def main():
             choice = input("\nChoice: ").strip().lower()
             
             if choice == 'e':
-                print_color("\nEnter your custom commit message (press Enter twice to finish):", "YELLOW")
-                lines = []
-                empty_lines = 0
-                while empty_lines < 2:
-                    line = input()
-                    if not line.strip():
-                        empty_lines += 1
-                    else:
-                        empty_lines = 0
-                        lines.append(line)
+                print_color("\nOpening commit message in your editor (save and close to continue)...", "YELLOW")
+                edited = edit_in_editor(commit_message)
                 
-                if lines:
-                    commit_message = "\n".join(lines)
+                if edited is None:
+                    # Don't commit the unedited message behind the user's back
+                    print_color("Editing failed, message unchanged. Choose again or press Ctrl+C to abort.", "RED")
+                    continue
+                if edited:
+                    commit_message = edited
+                else:
+                    print_color("Empty message, keeping the generated one", "DIM")
             elif choice == 'r':
                  if use_copilot:
-                    commit_message = get_copilot_commit_message(diff, staged_files, args.max_diff_size)
+                    # The nonce asks Copilot for a different candidate for the same diff
+                    commit_message = get_copilot_commit_message(diff, staged_files, staged_stats, args.max_diff_size, nonce=secrets.token_hex(4))
                     print(f"\n{commit_message}")
                  else:
                      print_color("Cannot regenerate: Copilot not available", "RED")
+            break
 
     # Commit
     if args.dry_run: